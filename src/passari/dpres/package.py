@@ -1,8 +1,10 @@
 import asyncio
 import datetime
+import gzip
 import os
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import lxml.etree
@@ -21,7 +23,8 @@ from passari.logger import logger
 from passari.museumplus.connection import get_museum_session
 from passari.museumplus.db import (MuseumAttachment, MuseumCollectionActivity,
                                    MuseumObject)
-from passari.utils import gather_or_raise_first, retrieve_cached_xml
+from passari.utils import (gather_or_raise_first, get_xml_parser,
+                           retrieve_cached_xml)
 
 IMAGE_FORMATS = set(["gif", "tif", "tiff", "jpg", "jpeg"])
 DOCUMENT_FORMATS = set([
@@ -42,6 +45,12 @@ ARCHIVE_FORMATS = set(["zip"])
 CHUNK_SIZE = 8192
 ARCHIVE_PART_LENGTH = 3
 
+# Compression level used for archived log files, same as the default
+# of the 'gzip' command
+LOG_COMPRESS_LEVEL = 6
+# Maximum amount of threads used to compress log files
+LOG_COMPRESS_MAX_WORKERS = 8
+
 
 def get_archive_path_parts(object_id: int, sip_filename: str) -> list:
     """
@@ -61,6 +70,47 @@ def get_archive_path_parts(object_id: int, sip_filename: str) -> list:
     return id_parts + [f"Object_{object_id}", sip_filename]
 
 
+def scan_files(path, follow_symlinks=True):
+    """
+    Iterate the files under a directory recursively using os.scandir.
+
+    The file types reported by scandir are cached in the directory entries,
+    which saves a stat call per file compared to checking each path.
+    Symlinked directories are not followed.
+
+    :param path: Directory to scan
+    :param follow_symlinks: Whether to include symlinks pointing to files
+    """
+    try:
+        entries = os.scandir(path)
+    except FileNotFoundError:
+        return
+
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan_files(entry.path, follow_symlinks)
+            elif entry.is_file(follow_symlinks=follow_symlinks):
+                yield Path(entry.path)
+
+
+def gzip_file(path: Path):
+    """
+    Compress a file using gzip, replacing it with a .gz suffixed copy
+    in the same way as the 'gzip' command
+    """
+    gz_path = path.with_name(f"{path.name}.gz")
+
+    with open(path, "rb") as in_file:
+        with gzip.GzipFile(
+                gz_path, "wb", compresslevel=LOG_COMPRESS_LEVEL,
+                mtime=0) as out_file:
+            shutil.copyfileobj(in_file, out_file, 256 * 1024)
+
+    shutil.copystat(path, gz_path)
+    path.unlink()
+
+
 class MuseumObjectPackage:
     """
     Museum object representing an object and attachments downloaded
@@ -172,11 +222,8 @@ class MuseumObjectPackage:
         Load the underlying MuseumObject instance
         """
         # Load the XML file that has already been saved into the directory
-        with open(self.report_dir / "Object.xml", "rb") as f:
-            etree = lxml.etree.fromstring(f.read())
-
-        self.museum_object = MuseumObject(
-            etree=etree, session=None
+        self.museum_object = MuseumObject.from_path(
+            self.report_dir / "Object.xml"
         )
 
     async def download_attachment(self, item_id: int) -> MuseumAttachment:
@@ -308,8 +355,9 @@ class MuseumObjectPackage:
 
         try:
             with open(attachment_xml_path, "rb") as file_:
-                data = file_.read()
-                etree = lxml.etree.fromstring(data)
+                etree = lxml.etree.parse(
+                    file_, parser=get_xml_parser()
+                ).getroot()
                 return MuseumAttachment(etree)
         except FileNotFoundError:
             return None
@@ -340,8 +388,9 @@ class MuseumObjectPackage:
 
         try:
             with open(col_activity_xml_path, "rb") as file_:
-                data = file_.read()
-                etree = lxml.etree.fromstring(data)
+                etree = lxml.etree.parse(
+                    file_, parser=get_xml_parser()
+                ).getroot()
                 return MuseumCollectionActivity(etree)
         except FileNotFoundError:
             return None
@@ -371,9 +420,15 @@ class MuseumObjectPackage:
             self.attachments
         ])
 
-        for path in self.attachment_dir.glob("*"):
-            if path.is_dir() and path.name not in attachment_ids:
-                shutil.rmtree(path)
+        try:
+            entries = os.scandir(self.attachment_dir)
+        except FileNotFoundError:
+            return
+
+        with entries:
+            for entry in entries:
+                if entry.is_dir() and entry.name not in attachment_ids:
+                    shutil.rmtree(entry.path)
 
     async def download_collection_activities(self):
         """
@@ -414,9 +469,19 @@ class MuseumObjectPackage:
             self.collection_activities
         ])
 
-        for path in self.collection_activity_dir.glob("*"):
-            if path.is_dir() and path.name not in collection_activity_ids:
-                shutil.rmtree(path)
+        try:
+            entries = os.scandir(self.collection_activity_dir)
+        except FileNotFoundError:
+            return
+
+        with entries:
+            for entry in entries:
+                is_stale = (
+                    entry.is_dir()
+                    and entry.name not in collection_activity_ids
+                )
+                if is_stale:
+                    shutil.rmtree(entry.path)
 
     async def download_reports(self):
         """
@@ -459,11 +524,10 @@ class MuseumObjectPackage:
         This is done to continue from an interrupted process during which
         some files were downloaded already
         """
-        files = (
-            list(self.report_dir.glob("**/*")) +
-            list(self.attachment_dir.glob("**/*"))
+        self.all_files = (
+            list(scan_files(self.report_dir)) +
+            list(scan_files(self.attachment_dir))
         )
-        self.all_files = [f for f in files if f.is_file()]
 
     def copy_log_files_to_archive(self, archive_dir):
         """
@@ -479,9 +543,20 @@ class MuseumObjectPackage:
 
         # Compress the existing log files using gzip, replacing existing
         # files with .gz suffixed copies. This is idempotent.
-        subprocess.run([
-            "gzip", "--recursive", str(self.log_dir)
-        ], check=True)
+        # zlib releases the GIL while compressing, so the files can be
+        # compressed in parallel using threads.
+        log_paths = [
+            path for path in scan_files(self.log_dir, follow_symlinks=False)
+            if path.suffix != ".gz"
+        ]
+
+        if log_paths:
+            max_workers = min(
+                len(log_paths), os.cpu_count() or 1, LOG_COMPRESS_MAX_WORKERS
+            )
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Consume the results to raise any exceptions
+                list(executor.map(gzip_file, log_paths))
 
         # Copy the log files over
         subprocess.run([
@@ -6,7 +6,7 @@ import lxml.etree
 
 from passari.config import MUSEUMPLUS_URL
 from passari.museumplus.settings import ZETCOM_NS
-from passari.utils import retrieve_xml
+from passari.utils import get_xml_parser, retrieve_xml
 
 
 class BaseMuseumModule:
@@ -81,6 +81,18 @@ class MuseumObject(BaseMuseumModule):
         self.etree = etree
         self.session = session
 
+    @classmethod
+    def from_path(cls, path, session=None):
+        """
+        Create a MuseumObject from a XML document saved on disk
+
+        :param path: Path to the XML document
+        :param session: Optional aiohttp.Session instance
+        """
+        etree = lxml.etree.parse(str(path), parser=get_xml_parser()).getroot()
+
+        return cls(etree=etree, session=session)
+
     def tostring(self) -> bytes:
         """
         Return the XML document as a bytestring that can be saved
@@ -212,6 +224,16 @@ class MuseumCollectionActivity(BaseMuseumModule):
         return self.identifier
 
 
+# Count the non-system fields in an Object document
+_count_object_fields = lxml.etree.XPath(
+    "count("
+    "zetcom:modules"
+    "//zetcom:moduleItem"
+    "/zetcom:*[local-name() != 'systemField'])",
+    namespaces={"zetcom": ZETCOM_NS}
+)
+
+
 def check_object_xml(xml):
     """
     Check that the XML document for an Object is complete, otherwise raise
@@ -224,14 +246,7 @@ def check_object_xml(xml):
     """
     # Count the fields besides systemFields. If there are none, the service
     # is likely returning truncated XML documents
-    field_count = len(
-        xml.xpath(
-            "zetcom:modules"
-            "//zetcom:moduleItem"
-            "/zetcom:*[local-name() != 'systemField']",
-            namespaces={"zetcom": ZETCOM_NS}
-        )
-    )
+    field_count = _count_object_fields(xml)
 
     if field_count == 0:
         raise IOError(
@@ -1,11 +1,18 @@
 import datetime
 import json
 
-from lxml.etree import Element, fromstring, tostring
+from lxml.etree import Element, XPath, fromstring, tostring
 
 from passari.config import CONFIG, MUSEUMPLUS_URL
 from passari.museumplus.settings import ZETCOM_NS
-from passari.utils import retrieve_xml
+from passari.utils import get_xml_parser, retrieve_xml
+
+# Compiled once, as the same query is performed for every confirmed SIP
+FIELD_VALUE_XPATH = XPath(
+    "zetcom:modules//zetcom:moduleItem[@id=$object_id]"
+    "/zetcom:*[@name=$name]/zetcom:value",
+    namespaces={"zetcom": ZETCOM_NS}
+)
 
 
 async def get_object_field(session, object_id: int, name: str):
@@ -22,16 +29,13 @@ async def get_object_field(session, object_id: int, name: str):
     xml = await retrieve_xml(
         session, f"{MUSEUMPLUS_URL}/module/Object/{object_id}"
     )
-    try:
-        return xml.find(
-            f"{{{ZETCOM_NS}}}modules//"
-            f"{{{ZETCOM_NS}}}moduleItem[@id='{object_id}']"
-            f"{{{ZETCOM_NS}}}*[@name='{name}']"
-            f"{{{ZETCOM_NS}}}value"
-        ).text
-    except AttributeError:
+    values = FIELD_VALUE_XPATH(xml, object_id=str(object_id), name=name)
+
+    if not values:
         return None
 
+    return values[0].text
+
 
 UPDATE_FIELD_TEMPLATE = """
 <?xml version="1.0" encoding="UTF-8"?>
@@ -60,7 +64,8 @@ async def set_object_field(
     :param value: Value to set
     """
     root = fromstring(
-        UPDATE_FIELD_TEMPLATE.format(object_id=object_id).encode("utf-8")
+        UPDATE_FIELD_TEMPLATE.format(object_id=object_id).encode("utf-8"),
+        parser=get_xml_parser()
     )
 
     module_elem = root.find(
@@ -1,12 +1,15 @@
 import datetime
+import io
+import re
+from xml.sax.saxutils import escape
 
 import dateutil.parser
 import lxml.etree as ET
 
 from passari.config import CONFIG, MUSEUMPLUS_URL
 from passari.logger import logger
-from passari.museumplus.settings import ZETCOM_NS, ZETCOM_SEARCH_NS
-from passari.utils import get_xml_hash, post_xml
+from passari.museumplus.settings import ZETCOM_NS
+from passari.utils import get_xml_hash, post_xml_raw
 
 # Search template to retrieve objects in an ascending order from oldest to
 # newest.
@@ -18,39 +21,132 @@ SEARCH_TEMPLATE = """
       <search limit="{limit}" offset="{offset}">
         <sort>
           <field fieldPath="__id" direction="Ascending"/>
-        </sort>
+        </sort>{search_filter}
       </search>
     </module>
   </modules>
 </application>"""[1:]  # Skip the first newline to make XML valid
 
+# Search filter to only retrieve objects modified after the given date or
+# objects without a modification date
+SEARCH_MODIFY_DATE_FILTER_TEMPLATE = """
+        <expert module="{module_name}">
+          <or>
+            <greaterEquals fieldPath="__lastModified" operand="{modify_date}"/>
+            <isNull fieldPath="__lastModified"/>
+          </or>
+        </expert>"""
+
+# Entities to escape in addition to "&", "<" and ">" when a value is
+# inserted into an attribute
+XML_ATTR_ENTITIES = {'"': "&quot;"}
+
+# Object fields that change during the preservation process and are ignored
+# when calculating the XML metadata hash
+OBJECT_VOLATILE_FIELD_QUERIES = (
+    f"{{{ZETCOM_NS}}}systemField[@name='__lastModified']",
+    f"{{{ZETCOM_NS}}}systemField[@name='__lastModifiedUser']"
+)
+
+
+# Tags of the fields that appear directly under a 'moduleItem' element
+SYSTEM_FIELD_TAG = f"{{{ZETCOM_NS}}}systemField"
+DATA_FIELD_TAG = f"{{{ZETCOM_NS}}}dataField"
+VIRTUAL_FIELD_TAG = f"{{{ZETCOM_NS}}}virtualField"
+VALUE_TAG = f"{{{ZETCOM_NS}}}value"
+
+MODULE_ITEM_TAG = f"{{{ZETCOM_NS}}}moduleItem"
+MODULE_ITEM_PATH = f"{{{ZETCOM_NS}}}modules//{MODULE_ITEM_TAG}"
+
+MODULE_REFERENCE_TAG = f"{{{ZETCOM_NS}}}moduleReference"
+MODULE_REFERENCE_ITEM_TAG = f"{{{ZETCOM_NS}}}moduleReferenceItem"
+
+# Paths to the references from Object to Multimedia and vice versa
+OBJECT_MULTIMEDIA_REF_PATH = (
+    f".//{MODULE_REFERENCE_TAG}[@name='ObjMultimediaRef']//"
+    f"{MODULE_REFERENCE_ITEM_TAG}"
+)
+MULTIMEDIA_OBJECT_REF_PATH = (
+    f".//{MODULE_REFERENCE_TAG}[@name='MulObjectRef']//"
+    f"{MODULE_REFERENCE_ITEM_TAG}"
+)
+
+# Timestamp format used by MuseumPlus, e.g. '2018-11-21 10:44:19.6'
+TIMESTAMP_RE = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})[ T](\d{2}):(\d{2}):(\d{2})(?:\.(\d+))?"
+)
+
+
+def get_field_values(module_item, fields) -> dict:
+    """
+    Get the values of the given fields in a module item using a single
+    pass over its children
+
+    :param module_item: 'moduleItem' element
+    :param fields: Collection of (tag, name) tuples identifying the fields
+    :returns: Dict of (tag, name) tuples to field values for the fields
+              that were found
+    """
+    values = {}
+
+    for field in module_item.iterchildren(
+            SYSTEM_FIELD_TAG, DATA_FIELD_TAG, VIRTUAL_FIELD_TAG):
+        key = (field.tag, field.get("name"))
+        if key not in fields or key in values:
+            continue
+
+        value = next(field.iter(VALUE_TAG), None)
+        if value is not None:
+            values[key] = value.text
+
+    return values
+
+
+def parse_timestamp(value):
+    """
+    Parse a timestamp returned by MuseumPlus, or return None if the
+    timestamp is missing
+    """
+    if value is None:
+        return None
+
+    # Timestamps returned by MuseumPlus are in UTC.
+    # Parse the usual format directly and leave anything else to dateutil.
+    match = TIMESTAMP_RE.fullmatch(value)
+    if not match:
+        date = dateutil.parser.parse(value)
+        return date.replace(tzinfo=datetime.timezone.utc)
+
+    year, month, day, hour, minute, second, fraction = match.groups()
+    microsecond = int(fraction[:6].ljust(6, "0")) if fraction else 0
+
+    return datetime.datetime(
+        int(year), int(month), int(day), int(hour), int(minute), int(second),
+        microsecond, tzinfo=datetime.timezone.utc
+    )
+
 
 def format_search_request(
         module_name, limit, offset, modify_date_gte=None) -> bytes:
     """
     Return a XML-formatted request body to perform the given search
     """
-    data = SEARCH_TEMPLATE.format(
-        module_name=module_name, limit=limit, offset=offset
-    )
-    xml = ET.fromstring(data.encode("utf-8"))
+    module_name = escape(module_name, XML_ATTR_ENTITIES)
 
+    search_filter = ""
     if modify_date_gte:
         # Add the search filter if necessary
-        search_elem = xml.find(f".//{{{ZETCOM_SEARCH_NS}}}search")
-        expert_elem = ET.SubElement(search_elem, "expert")
-        expert_elem.attrib["module"] = module_name
-
-        or_elem = ET.SubElement(expert_elem, "or")
-        or_elem.append(
-            ET.Element(
-                "greaterEquals",
-                fieldPath="__lastModified", operand=modify_date_gte.isoformat()
+        search_filter = SEARCH_MODIFY_DATE_FILTER_TEMPLATE.format(
+            module_name=module_name,
+            modify_date=escape(
+                modify_date_gte.isoformat(), XML_ATTR_ENTITIES
             )
         )
-        or_elem.append(ET.Element("isNull", fieldPath="__lastModified"))
 
-    return ET.tostring(xml)
+    return SEARCH_TEMPLATE.format(
+        module_name=module_name, limit=int(limit), offset=int(offset),
+        search_filter=search_filter
+    ).encode("utf-8")
 
 
 class MuseumSearchResponse:
@@ -60,79 +156,83 @@ class MuseumSearchResponse:
     This should be subclassed for each search type.
     """
     def __init__(self, etree):
+        """
+        :param etree: Parsed XML document
+        """
         self.etree = etree
 
+        # Unparsed XML document, set when the response is created using
+        # :meth:`from_bytes`
+        self.content = None
+
+    @classmethod
+    def from_bytes(cls, content: bytes):
+        """
+        Create a response from the unparsed XML document.
+
+        The results are parsed one module item at a time when they are
+        iterated using :meth:`iterate_results`.
+        """
+        response = cls(etree=None)
+        response.content = content
+
+        return response
+
     def module_item_to_result(self, module_item):
         raise NotImplementedError()
 
+    def iterate_results(self):
+        """
+        Iterate the results in the response.
+
+        If the response was created using :meth:`from_bytes`, the document
+        is parsed incrementally and each module item is discarded once its
+        result has been returned, so the whole document is never kept in
+        memory.
+        """
+        if self.content is None:
+            for module_item in self.etree.iterfind(MODULE_ITEM_PATH):
+                yield self.module_item_to_result(module_item)
+
+            return
+
+        events = ET.iterparse(
+            io.BytesIO(self.content), events=("end",), tag=MODULE_ITEM_TAG,
+            collect_ids=False, resolve_entities=False
+        )
+
+        for _, module_item in events:
+            yield self.module_item_to_result(module_item)
+
+            # Free the processed module item and the ones before it
+            module_item.clear(keep_tail=True)
+            parent = module_item.getparent()
+            while module_item.getprevious() is not None:
+                del parent[0]
+
     @property
     def results(self):
-        module_items = self.etree.findall(
-            f"{{{ZETCOM_NS}}}modules//"
-            f"{{{ZETCOM_NS}}}moduleItem"
-        )
+        return list(self.iterate_results())
 
-        return [
-            self.module_item_to_result(module_item)
-            for module_item in module_items
-        ]
+
+# Fields read from each Object search result
+OBJECT_RESULT_FIELDS = frozenset({
+    (SYSTEM_FIELD_TAG, "__id"),
+    (SYSTEM_FIELD_TAG, "__lastModified"),
+    (SYSTEM_FIELD_TAG, "__created"),
+    (VIRTUAL_FIELD_TAG, "ObjObjectVrt")
+})
 
 
 class ObjectSearchResponse(MuseumSearchResponse):
     """
     Class for parsing Object search results
     """
-    def module_item_to_result(self, module_item):
-        object_id = module_item.find(
-            f"{{{ZETCOM_NS}}}systemField[@name='__id']//"
-            f"{{{ZETCOM_NS}}}value"
-        ).text
-
-        try:
-            title = module_item.find(
-                f"{{{ZETCOM_NS}}}virtualField[@name='ObjObjectVrt']//"
-                f"{{{ZETCOM_NS}}}value"
-            ).text
-        except AttributeError:
-            title = None
-
-        try:
-            modified_date = module_item.find(
-                f"{{{ZETCOM_NS}}}systemField[@name='__lastModified']//"
-                f"{{{ZETCOM_NS}}}value"
-            ).text
-            modified_date = dateutil.parser.parse(modified_date)
-            modified_date = modified_date.replace(tzinfo=datetime.timezone.utc)
-        except AttributeError:
-            # Some objects don't actually have a creation and modification
-            # dates
-            modified_date = None
-
-        try:
-            created_date = module_item.find(
-                f"{{{ZETCOM_NS}}}systemField[@name='__created']//"
-                f"{{{ZETCOM_NS}}}value"
-            ).text
-            created_date = dateutil.parser.parse(created_date)
-            created_date = created_date.replace(tzinfo=datetime.timezone.utc)
-        except AttributeError:
-            created_date = None
-
-        multimedia_ids = [
-            int(module.attrib["moduleItemId"])
-            for module in module_item.findall(
-                f".//{{{ZETCOM_NS}}}moduleReference[@name='ObjMultimediaRef']//"
-                f"{{{ZETCOM_NS}}}moduleReferenceItem"
-            )
-        ]
+    def __init__(self, etree):
+        super().__init__(etree)
 
-        # Calculate the XML metadata hash for Object, while ignoring
-        # some volatile fields that we will change during the preservation
-        # process
-        volatile_field_queries = [
-            f"{{{ZETCOM_NS}}}systemField[@name='__lastModified']",
-            f"{{{ZETCOM_NS}}}systemField[@name='__lastModifiedUser']"
-        ]
+        # Volatile fields are the same for every Object in the response
+        self.volatile_field_queries = OBJECT_VOLATILE_FIELD_QUERIES
 
         if CONFIG.get("museumplus", {}).get("object_preservation_field_name"):
             field_name = (
@@ -142,13 +242,36 @@ class ObjectSearchResponse(MuseumSearchResponse):
                 CONFIG["museumplus"]["object_preservation_field_type"]
             )
 
-            volatile_field_queries.append(
-                f"{{{ZETCOM_NS}}}{field_type}[@name='{field_name}']"
+            self.volatile_field_queries += (
+                f"{{{ZETCOM_NS}}}{field_type}[@name='{field_name}']",
             )
 
+    def module_item_to_result(self, module_item):
+        values = get_field_values(module_item, OBJECT_RESULT_FIELDS)
+
+        object_id = values[(SYSTEM_FIELD_TAG, "__id")]
+        title = values.get((VIRTUAL_FIELD_TAG, "ObjObjectVrt"))
+
+        # Some objects don't actually have a creation and modification
+        # dates
+        modified_date = parse_timestamp(
+            values.get((SYSTEM_FIELD_TAG, "__lastModified"))
+        )
+        created_date = parse_timestamp(
+            values.get((SYSTEM_FIELD_TAG, "__created"))
+        )
+
+        multimedia_ids = [
+            int(module.attrib["moduleItemId"])
+            for module in module_item.findall(OBJECT_MULTIMEDIA_REF_PATH)
+        ]
+
+        # Calculate the XML metadata hash for Object, while ignoring
+        # some volatile fields that we will change during the preservation
+        # process
         xml_hash = get_xml_hash(
             module_item,
-            volatile_field_queries=volatile_field_queries
+            volatile_field_queries=self.volatile_field_queries
         )
 
         return {
@@ -161,6 +284,15 @@ class ObjectSearchResponse(MuseumSearchResponse):
         }
 
 
+# Fields read from each Multimedia search result
+MULTIMEDIA_RESULT_FIELDS = frozenset({
+    (SYSTEM_FIELD_TAG, "__id"),
+    (SYSTEM_FIELD_TAG, "__lastModified"),
+    (SYSTEM_FIELD_TAG, "__created"),
+    (DATA_FIELD_TAG, "MulOriginalFileTxt")
+})
+
+
 class MultimediaSearchResponse(MuseumSearchResponse):
     """
     Class for parsing Multimedia search results
@@ -169,38 +301,16 @@ class MultimediaSearchResponse(MuseumSearchResponse):
         """
         Convert a module's XML element to a result dict
         """
-        multimedia_id = module_item.find(
-            f"{{{ZETCOM_NS}}}systemField[@name='__id']//"
-            f"{{{ZETCOM_NS}}}value"
-        ).text
-
-        try:
-            filename = module_item.find(
-                f"{{{ZETCOM_NS}}}dataField[@name='MulOriginalFileTxt']//"
-                f"{{{ZETCOM_NS}}}value"
-            ).text
-        except AttributeError:
-            filename = None
-
-        try:
-            modified_date = module_item.find(
-                f"{{{ZETCOM_NS}}}systemField[@name='__lastModified']//"
-                f"{{{ZETCOM_NS}}}value"
-            ).text
-            modified_date = dateutil.parser.parse(modified_date)
-            modified_date = modified_date.replace(tzinfo=datetime.timezone.utc)
-        except AttributeError:
-            modified_date = None
-
-        try:
-            created_date = module_item.find(
-                f"{{{ZETCOM_NS}}}systemField[@name='__created']//"
-                f"{{{ZETCOM_NS}}}value"
-            ).text
-            created_date = dateutil.parser.parse(created_date)
-            created_date = created_date.replace(tzinfo=datetime.timezone.utc)
-        except AttributeError:
-            created_date = None
+        values = get_field_values(module_item, MULTIMEDIA_RESULT_FIELDS)
+
+        multimedia_id = values[(SYSTEM_FIELD_TAG, "__id")]
+        filename = values.get((DATA_FIELD_TAG, "MulOriginalFileTxt"))
+        modified_date = parse_timestamp(
+            values.get((SYSTEM_FIELD_TAG, "__lastModified"))
+        )
+        created_date = parse_timestamp(
+            values.get((SYSTEM_FIELD_TAG, "__created"))
+        )
 
         # In Multimedia results, the moduleReference is wrapped like this:
         # <composite>
@@ -213,10 +323,7 @@ class MultimediaSearchResponse(MuseumSearchResponse):
         # Use a more coarse query to catch both cases
         object_ids = [
             int(module.attrib["moduleItemId"])
-            for module in module_item.findall(
-                f".//{{{ZETCOM_NS}}}moduleReference[@name='MulObjectRef']//"
-                f"{{{ZETCOM_NS}}}moduleReferenceItem"
-            )
+            for module in module_item.findall(MULTIMEDIA_OBJECT_REF_PATH)
         ]
 
         # The "last modification" fields don't need to be ignored during
@@ -263,22 +370,23 @@ async def _iterate_search(
             module_name=module_name, offset=offset, limit=limit,
             modify_date_gte=modify_date_gte
         )
-        search_result = await post_xml(
+        search_result = await post_xml_raw(
             session,
             url=f"{MUSEUMPLUS_URL}/module/{module_name}/search",
             data=search_request
         )
-        search_result = response_cls(search_result)
-        results = search_result.results
-
-        if not results:
-            logger.info("Iterated all %d results", result_count)
-            break
+        search_result = response_cls.from_bytes(search_result)
 
-        for result in results:
+        page_result_count = 0
+        for result in search_result.iterate_results():
+            page_result_count += 1
             result_count += 1
             yield result
 
+        if not page_result_count:
+            logger.info("Iterated all %d results", result_count)
+            break
+
         offset += limit
 
 
@@ -1,16 +1,35 @@
 import asyncio
 import contextlib
 import datetime
+import functools
 import hashlib
+import threading
 from concurrent.futures import FIRST_EXCEPTION, ALL_COMPLETED
 
-import dateutil.parser
 import lxml.etree
 from click.types import ParamType
 
-import aiofiles
 from passari.logger import logger
 
+_thread_local = threading.local()
+
+
+def get_xml_parser():
+    """
+    Return a XML parser shared by the current thread
+
+    ID collection and entity resolution are disabled, as neither is needed
+    for the documents we retrieve, and both add extra work when the document
+    is parsed and later canonicalized.
+    """
+    try:
+        return _thread_local.xml_parser
+    except AttributeError:
+        _thread_local.xml_parser = lxml.etree.XMLParser(
+            collect_ids=False, resolve_entities=False
+        )
+        return _thread_local.xml_parser
+
 
 async def retrieve_xml(session, url: str):
     """
@@ -23,22 +42,31 @@ async def retrieve_xml(session, url: str):
     response.raise_for_status()
     result = await response.read()
 
-    return lxml.etree.fromstring(result)
+    return lxml.etree.fromstring(result, parser=get_xml_parser())
 
 
-async def post_xml(session, url: str, data: dict):
+async def post_xml_raw(session, url: str, data: dict) -> bytes:
     """
     Retrieve an XML document from the given URL using a POST request
-    and return the XML document's root node
+    and return the XML document without parsing it
     """
     response = await session.post(
         url, headers={"Content-Type": "application/xml"},
         data=data
     )
     response.raise_for_status()
-    result = await response.read()
 
-    return lxml.etree.fromstring(result)
+    return await response.read()
+
+
+async def post_xml(session, url: str, data: dict):
+    """
+    Retrieve an XML document from the given URL using a POST request
+    and return the XML document's root node
+    """
+    result = await post_xml_raw(session, url=url, data=data)
+
+    return lxml.etree.fromstring(result, parser=get_xml_parser())
 
 
 async def retrieve_cached_xml(session, url: str, path):
@@ -53,6 +81,8 @@ async def retrieve_cached_xml(session, url: str, path):
     This function can be used for XML content that changes infrequently
     and doesn't need to be redownloaded each time
     """
+    import aiofiles
+
     content = None
 
     try:
@@ -70,7 +100,7 @@ async def retrieve_cached_xml(session, url: str, path):
         async with aiofiles.open(path, "wb") as file_:
             await file_.write(content)
 
-    return lxml.etree.fromstring(content)
+    return lxml.etree.fromstring(content, parser=get_xml_parser())
 
 
 async def gather_or_raise_first(*aws):
@@ -90,31 +120,34 @@ async def gather_or_raise_first(*aws):
     # Wait until all tasks succeed or one of them fails
     await asyncio.wait(tasks, return_when=FIRST_EXCEPTION)
 
-    failed_tasks = [
-        task for task in tasks
-        if task.done() and task.exception() is not None
-    ]
+    # Cancel the unfinished tasks and log the exceptions in a single pass.
+    # If no task failed, every task is done at this point and nothing
+    # is cancelled.
+    first_exc = None
+    exc_count = 0
 
-    if failed_tasks:
-        # One of the tasks failed, cancel all tasks and raise the first
-        # exception we find
-        for task in tasks:
-            if not task.done():
-                task.cancel()
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+            continue
 
+        exc = task.exception()
+        if exc is not None:
+            exc_count += 1
+            if first_exc is None:
+                first_exc = exc
+
+            logger.warning("Caught: %s", str(exc))
+
+    if first_exc is not None:
         # Ensure all tasks are completed including cancellations
         await asyncio.wait(tasks, return_when=ALL_COMPLETED)
 
-        # Log all the exceptions
-        excs = [task.exception() for task in failed_tasks]
-
         logger.warning(
-            "'gather_or_raise_first' caught %d exceptions.", len(excs)
+            "'gather_or_raise_first' caught %d exceptions.", exc_count
         )
-        for exc in excs:
-            logger.warning("Caught: %s", str(exc))
 
-        raise failed_tasks[0].exception()
+        raise first_exc
 
     # All succeeded, return the results
     return [task.result() for task in tasks]
@@ -132,6 +165,33 @@ def unix_timestamp_to_datetime(timestamp: int):
     return date
 
 
+class _HashWriter:
+    """
+    File-like object that feeds everything written into it to a hash
+    """
+    def __init__(self, hash_):
+        self.hash = hash_
+
+    def write(self, data):
+        self.hash.update(data)
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_volatile_field_queries(
+        base_query: str, volatile_field_queries: tuple):
+    """
+    Compile the volatile field queries into a single XPath expression.
+
+    The queries are combined into an union so that the document only
+    needs to be traversed once. The same queries are usually used for
+    every document during a run, so the compiled expression is cached.
+    """
+    return lxml.etree.ETXPath(" | ".join(
+        f"{base_query}//{field_query}"
+        for field_query in volatile_field_queries
+    ))
+
+
 def get_xml_hash(
         root: lxml.etree.Element,
         volatile_field_queries: list = None,
@@ -142,24 +202,49 @@ def get_xml_hash(
 
     This makes it possible to detect changes for XML documents while ignoring
     fields like "last modification datetime" that shouldn't trigger an update.
-    """
-    if not volatile_field_queries:
-        volatile_field_queries = []
 
-    for field_query in volatile_field_queries:
-        xpath_query = f"{base_query}//{field_query}"
+    :param root: Element to calculate the hash for
+    :param volatile_field_queries: Fields to strip out. Each entry is either
+                                   an ElementPath string matched against
+                                   descendants of `base_query`, or a
+                                   compiled `lxml.etree.XPath` instance
+                                   evaluated against `root` as-is.
+    :param base_query: Query under which string queries are matched
 
-        for elem in root.findall(xpath_query):
-            elem.getparent().remove(elem)
+    .. note::
 
-    data = lxml.etree.tostring(
-        root,
-        method="c14n",  # Use Canonical XML to make output deterministic
-        with_comments=False, strip_text=True
+        The document should be parsed using the parser returned by
+        :func:`get_xml_parser`. The default parser collects IDs and
+        resolves entities, which only adds work during canonicalization.
+        The given element is modified in-place.
+    """
+    if volatile_field_queries:
+        xpaths = [
+            query for query in volatile_field_queries
+            if not isinstance(query, str)
+        ]
+        string_queries = tuple(
+            query for query in volatile_field_queries
+            if isinstance(query, str)
+        )
+        if string_queries:
+            xpaths.append(
+                _compile_volatile_field_queries(base_query, string_queries)
+            )
+
+        for xpath in xpaths:
+            for elem in xpath(root):
+                elem.getparent().remove(elem)
+
+    # Use Canonical XML to make output deterministic. The canonicalized
+    # document is streamed into the hash instead of being serialized
+    # into a single bytestring first.
+    hash_ = hashlib.sha256()
+    lxml.etree.ElementTree(root).write_c14n(
+        _HashWriter(hash_), with_comments=False
     )
-    hash_ = hashlib.sha256(data).hexdigest()
 
-    return hash_
+    return hash_.hexdigest()
 
 
 @contextlib.contextmanager
@@ -191,6 +276,8 @@ class DateTimeType(ParamType):
     name = "datetime"
 
     def convert(self, value, param, ctx):
+        import dateutil.parser
+
         try:
             return dateutil.parser.isoparse(value)
         except ValueError:
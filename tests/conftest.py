@@ -1,13 +1,24 @@
+import os
 import random
 import shutil
 import string
 import subprocess
+import sys
+import tempfile
 from pathlib import Path
 
+import lxml.etree
 import pytest
 from passari.config import CONFIG
+from passari.utils import get_xml_parser
 from tests.dpres.conftest import *
 from tests.museumplus.conftest import *
+from tests.museumplus.conftest import MOCK_ROOT
+
+SHM_PATH = "/dev/shm"
+
+# Minimum amount of free space required to use SHM_PATH for temporary files
+SHM_MIN_FREE_SPACE = 1024**3
 
 
 def pytest_addoption(parser):
@@ -19,6 +30,29 @@ def pytest_addoption(parser):
 def pytest_configure(config):
     config.addinivalue_line("markers", "slow: mark test as slow to run")
 
+    # Keep temporary files in RAM if possible, since the SIP tests write
+    # and extract large TAR archives. pytest-xdist workers inherit the
+    # base directory from the controller process.
+    if config.option.basetemp or hasattr(config, "workerinput"):
+        return
+
+    if not sys.platform.startswith("linux") \
+            or not os.access(SHM_PATH, os.W_OK):
+        return
+
+    if shutil.disk_usage(SHM_PATH).free < SHM_MIN_FREE_SPACE:
+        return
+
+    config.option.basetemp = tempfile.mkdtemp(prefix="pytest-", dir=SHM_PATH)
+    config._shm_basetemp = config.option.basetemp
+
+
+def pytest_unconfigure(config):
+    # Don't leave the temporary files to consume RAM after the test run
+    shm_basetemp = getattr(config, "_shm_basetemp", None)
+    if shm_basetemp:
+        shutil.rmtree(shm_basetemp, ignore_errors=True)
+
 
 def pytest_collection_modifyitems(config, items):
     if config.getoption("--slow"):
@@ -43,6 +77,16 @@ def cache_dir(tmpdir, monkeypatch):
     yield Path(tmpdir / ".cache")
 
 
+@pytest.fixture(scope="session")
+def downloaded_packages_dir(tmp_path_factory):
+    """
+    Fixture pointing to a session-wide directory containing museum packages
+    that have been downloaded once. Tests receive their own copies of
+    these packages.
+    """
+    return tmp_path_factory.mktemp("downloaded_packages")
+
+
 @pytest.fixture(scope="function")
 def museum_packages_dir(tmpdir, monkeypatch):
     """
@@ -66,9 +110,7 @@ def museum_package_dir(museum_packages_dir):
     package_dir_.joinpath("sip", "reports").mkdir()
 
     shutil.copyfile(
-        Path(__file__).parent.resolve()
-        / "museumplus" / "data" / "museumplus_mock" / "module" / "Object"
-        / "1234567.xml",
+        MOCK_ROOT / "module" / "Object" / "1234567.xml",
         package_dir_ / "sip" / "reports" / "Object.xml"
     )
 
@@ -97,3 +139,19 @@ def extract_tar(tmpdir):
         return tar_path
 
     return func
+
+
+@pytest.fixture(scope="session")
+def parse_mets():
+    """
+    Parse the 'mets.xml' in a directory extracted using 'extract_tar'
+    and return the ElementTree
+
+    The file is parsed using the shared parser that doesn't collect the many
+    METS IDs into a lookup table.
+    """
+    def func(tar_path):
+        with open(tar_path / "mets.xml", "rb") as file_:
+            return lxml.etree.parse(file_, parser=get_xml_parser())
+
+    return func
@@ -1,6 +1,68 @@
+import os
+import shutil
 from pathlib import Path
 
+import lxml.etree
 import pytest
+from passari.config import CONFIG
+from passari.dpres.package import MuseumObjectPackage
+from passari.dpres.scripts import get_virtualenv_environ
+from passari.museumplus.db import MuseumAttachment
+from tests.museumplus.conftest import MOCK_ROOT
+
+# dpres-siptools commands run when generating a SIP
+DPRES_COMMANDS = (
+    "import-object", "create-mix", "premis-event", "import-description",
+    "compile-structmap", "compile-mets", "sign-mets"
+)
+
+
+def clone_package(src, dest):
+    """
+    Clone a downloaded package directory by hard linking the files,
+    falling back to copying if hard links can't be created
+    """
+    with os.scandir(src) as entries:
+        for entry in entries:
+            dest_path = os.path.join(dest, entry.name)
+
+            if entry.is_dir(follow_symlinks=False):
+                os.makedirs(dest_path, exist_ok=True)
+                clone_package(entry.path, dest_path)
+                continue
+
+            try:
+                os.link(entry.path, dest_path)
+            except OSError:
+                shutil.copy2(entry.path, dest_path)
+
+
+@pytest.fixture(scope="module")
+def prefetch_dpres_commands():
+    """
+    Ask the kernel to read the dpres-siptools commands into the page cache
+    before the tests that generate SIPs start running them
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+
+    if CONFIG["dpres"]["use_virtualenv"]:
+        search_path = get_virtualenv_environ(
+            virtualenv_path=CONFIG["dpres"]["virtualenv_path"]
+        )["PATH"]
+    else:
+        search_path = None
+
+    for name in DPRES_COMMANDS:
+        path = shutil.which(name, path=search_path)
+        if not path:
+            continue
+
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
 
 
 @pytest.fixture(scope="function")
@@ -12,20 +74,89 @@ def package_dir(tmpdir):
 
 
 @pytest.fixture(scope="function")
-@pytest.mark.asyncio
 async def museum_package_factory(
-        load_museum_object, mock_museumplus, package_dir):
+        load_museum_object, mock_museumplus, package_dir,
+        downloaded_packages_dir):
     async def func(object_id, sip_id=None):
         museum_object = load_museum_object(object_id=object_id)
-        museum_package = await museum_object.download_package(
+
+        # Each package is downloaded only once per test session and then
+        # cloned into the test's own directory
+        cached_dir = downloaded_packages_dir / str(object_id)
+        if not cached_dir.is_dir():
+            download_dir = downloaded_packages_dir / f"{object_id}.download"
+            await museum_object.download_package(download_dir)
+            os.rename(download_dir, cached_dir)
+
+        clone_package(cached_dir, package_dir)
+
+        museum_package = MuseumObjectPackage(
+            package_dir, museum_object=museum_object, sip_id=sip_id
+        )
+        museum_package.load_attachments()
+        museum_package.load_collection_activities()
+        museum_package.populate_files()
+
+        return museum_package
+
+    return func
+
+
+@pytest.fixture(scope="function")
+def minimal_package_factory(load_museum_object, package_dir):
+    """
+    Create a package directly from the mock MuseumPlus data without
+    downloading it over HTTP.
+
+    This is enough for tests that only need the files on disk, such as
+    those expecting 'generate_sip' to fail.
+    """
+    mock_dir = MOCK_ROOT / "module"
+
+    def func(object_id, sip_id=None):
+        museum_object = load_museum_object(object_id=object_id)
+        museum_package = MuseumObjectPackage(
+            package_dir, museum_object=museum_object, sip_id=sip_id
+        )
+
+        (museum_package.report_dir / "Object.xml").write_bytes(
+            museum_object.tostring()
+        )
+        shutil.copyfile(
+            mock_dir / "Object" / str(object_id) / "export" / "45005.xml",
+            museum_package.report_dir / "lido.xml"
+        )
+
+        for item_id in museum_object.attachment_ids:
+            attachment_dir = museum_package.attachment_dir / str(item_id)
+            attachment_dir.mkdir(parents=True)
+
+            shutil.copyfile(
+                mock_dir / "Multimedia" / f"{item_id}.xml",
+                attachment_dir / "Multimedia.xml"
+            )
+            attachment = MuseumAttachment(
+                lxml.etree.parse(str(attachment_dir / "Multimedia.xml"))
+            )
+
+            # Empty or missing attachments are only packaged as metadata,
+            # same as when downloading
+            source_path = mock_dir / "Multimedia" / str(item_id) / "attachment"
+            if source_path.is_file() and source_path.stat().st_size > 0:
+                shutil.copyfile(
+                    source_path, attachment_dir / attachment.filename
+                )
+
+        museum_package = MuseumObjectPackage.from_path_sync(
             package_dir, sip_id=sip_id
         )
+        museum_package.populate_files()
+
         return museum_package
 
     return func
 
 
 @pytest.fixture(scope="function")
-@pytest.mark.asyncio
 async def museum_package(museum_package_factory):
     return await museum_package_factory("1234567")
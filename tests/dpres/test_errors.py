@@ -1,6 +1,7 @@
 from subprocess import CalledProcessError
 
 import pytest
+from passari.dpres.scripts import import_object
 from passari.exceptions import PreservationError
 
 IMPORT_OBJECT_JPEG_UNSUPPORTED_STDERR = """
@@ -34,87 +35,72 @@ File format version is not supported.
 """
 
 
+@pytest.mark.parametrize(
+    "object_id,expected_error,import_object_stderr",
+    [
+        pytest.param(
+            "1234570", "Unsupported file format: wad", None,
+            id="unsupported_file_format"
+        ),
+        # TIFF file known to be invalid by JHOVE
+        pytest.param(
+            "1234577", "TIFF file failed JHOVE validation", None,
+            id="invalid_tiff_jhove"
+        ),
+        # Multi-page TIFFs are not allowed in the DPRES service
+        pytest.param(
+            "1234580", "Multi-page TIFF not allowed", None,
+            id="multipage_tiff_not_allowed"
+        ),
+        # JPEG that does not pass MIME type detection due to an issue in
+        # file-scraper's PilScraper
+        pytest.param(
+            "1234576", "JPEG MIME type detection failed",
+            IMPORT_OBJECT_JPEG_MIME_TYPE_ERROR_STDERR,
+            id="jpeg_mime_type_not_detected"
+        ),
+        # JPEG file with a file format version that is not supported
+        pytest.param(
+            "1234576", "JPEG version not supported",
+            IMPORT_OBJECT_JPEG_VERSION_NOT_SUPPORTED_STDERR,
+            id="jpeg_version_not_supported"
+        )
+    ]
+)
 @pytest.mark.asyncio
-async def test_generate_sip_unsupported_file_format(
-        package_dir, museum_package_factory):
-    """
-    Test generating a SIP with an unsupported file format and ensure
-    PreservationError is raised
-    """
-    museum_package = await museum_package_factory("1234570")
-
-    with pytest.raises(PreservationError) as exc:
-        await museum_package.generate_sip()
-
-    assert "Unsupported file format: wad" == exc.value.error
-
-
-@pytest.mark.asyncio
-async def test_generate_sip_invalid_tiff_jhove(
-        package_dir, museum_package_factory):
-    """
-    Test generating a SIP containing a TIFF file known to be invalid
-    by JHOVE, and ensure PreservationError is raised
-    """
-    museum_package = await museum_package_factory("1234577")
-
-    with pytest.raises(PreservationError) as exc:
-        await museum_package.generate_sip()
-
-    assert "TIFF file failed JHOVE validation" == exc.value.error
-
-
-@pytest.mark.asyncio
-async def test_generate_sip_multipage_tiff_not_allowed(
-        package_dir, museum_package_factory):
-    """
-    Test generating a SIP containing a multi-page TIFF which is not
-    allowed in the DPRES service
-    """
-    museum_package = await museum_package_factory("1234580")
-
-    with pytest.raises(PreservationError) as exc:
-        await museum_package.generate_sip()
-
-    assert "Multi-page TIFF not allowed" == exc.value.error
-
-
-@pytest.mark.asyncio
-async def test_generate_sip_jpeg_mime_type_not_detected(
-        package_dir, museum_package_factory, monkeypatch):
-    """
-    Test generating a SIP containing a JPEG that does not pass
-    MIME type detection due to an issue in file-scraper's PilScraper
-    """
-    # Monkeypatch 'import_object' since reproducing the error would
-    # since the image file containing the exact flaw can't be distributed
-    # publicly
-    async def mock_import_object(path, *args, **kwargs):
-        from passari.dpres.scripts import import_object
-
-        if path.name == "test.JPG":
-            raise CalledProcessError(
-                cmd=["import-object", str(path)],
-                returncode=1,
-                output=b"",
-                stderr=(
-                    IMPORT_OBJECT_JPEG_MIME_TYPE_ERROR_STDERR.encode("utf-8")
+async def test_generate_sip_preservation_error(
+        package_dir, minimal_package_factory, monkeypatch, object_id,
+        expected_error, import_object_stderr):
+    """
+    Test generating a SIP containing a file that can't be preserved
+    and ensure PreservationError is raised
+    """
+    if import_object_stderr is not None:
+        # Monkeypatch 'import_object' since reproducing the error would
+        # since the image file containing the exact flaw can't be
+        # distributed publicly
+        async def mock_import_object(path, *args, **kwargs):
+            if path.name == "test.JPG":
+                raise CalledProcessError(
+                    cmd=["import-object", str(path)],
+                    returncode=1,
+                    output=b"",
+                    stderr=import_object_stderr.encode("utf-8")
                 )
-            )
-        else:
+
             return await import_object(path, *args, **kwargs)
 
-    monkeypatch.setattr(
-        "passari.dpres.package.import_object",
-        mock_import_object
-    )
+        monkeypatch.setattr(
+            "passari.dpres.package.import_object",
+            mock_import_object
+        )
 
-    museum_package = await museum_package_factory("1234576")
+    museum_package = minimal_package_factory(object_id)
 
     with pytest.raises(PreservationError) as exc:
         await museum_package.generate_sip()
 
-    assert "JPEG MIME type detection failed" == exc.value.error
+    assert expected_error == exc.value.error
 
 
 @pytest.mark.asyncio
@@ -159,43 +145,3 @@ async def test_generate_sip_multimedia_xml_not_allowed(
         exc.value.error
         == "Filename 'Multimedia.xml' not allowed for attachment"
     )
-
-
-@pytest.mark.asyncio
-async def test_generate_sip_jpeg_version_not_supported(
-        package_dir, museum_package_factory, monkeypatch):
-    """
-    Test generating a SIP containing a JPEG file with a file format
-    that is not supported
-    """
-    # Monkeypatch 'import_object' since reproducing the error would
-    # since the image file containing the exact flaw can't be distributed
-    # publicly
-    async def mock_import_object(path, *args, **kwargs):
-        from passari.dpres.scripts import import_object
-
-        if path.name == "test.JPG":
-            raise CalledProcessError(
-                cmd=["import-object", str(path)],
-                returncode=1,
-                output=b"",
-                stderr=(
-                    IMPORT_OBJECT_JPEG_VERSION_NOT_SUPPORTED_STDERR.encode(
-                        "utf-8"
-                    )
-                )
-            )
-        else:
-            return await import_object(path, *args, **kwargs)
-
-    monkeypatch.setattr(
-        "passari.dpres.package.import_object",
-        mock_import_object
-    )
-
-    museum_package = await museum_package_factory("1234576")
-
-    with pytest.raises(PreservationError) as exc:
-        await museum_package.generate_sip()
-
-    assert "JPEG version not supported" == exc.value.error
@@ -1,12 +1,41 @@
+from collections import Counter
+
 import lxml.etree
 
 import pytest
 from passari.dpres.package import MuseumObjectPackage
-from tests.utils import is_image_file, is_xml_file
+from tests.utils import (is_image_file, is_xml_file, make_marker,
+                         scan_tree)
 
 METS_NS = "http://www.loc.gov/METS/"
 PREMIS_NS = "info:lc/xmlns/premis-v2"
 
+NAMESPACES = {"mets": METS_NS, "premis": PREMIS_NS}
+
+# Identifiers of all the files imported into the METS document
+OBJECT_IDENTIFIER_VALUES = lxml.etree.XPath(
+    "mets:amdSec//mets:techMD//premis:objectIdentifierValue/text()",
+    namespaces=NAMESPACES
+)
+CREATION_EVENT = lxml.etree.XPath(
+    "mets:amdSec//mets:digiprovMD//mets:mdWrap[@MDTYPE='PREMIS:EVENT']"
+    "//premis:event/"
+    "premis:eventDetail[.='Object database entry creation']/..",
+    namespaces=NAMESPACES
+)
+LIDO_MD_WRAP_COUNT = lxml.etree.XPath(
+    "count(mets:dmdSec//mets:mdWrap[@MDTYPE='LIDO'])",
+    namespaces=NAMESPACES
+)
+
+# Child elements of a PREMIS event
+EVENT_TYPE_TAG = f"{{{PREMIS_NS}}}eventType"
+EVENT_DATE_TIME_TAG = f"{{{PREMIS_NS}}}eventDateTime"
+EVENT_DETAIL_TAG = f"{{{PREMIS_NS}}}eventDetail"
+
+# Attachment filenames of the museum object 1234567
+KUVA_FILENAMES = frozenset({"kuva1.JPG", "kuva2.JPG"})
+
 
 class TestMuseumPackageDownload:
     @pytest.mark.asyncio
@@ -42,19 +71,21 @@ class TestMuseumPackageDownload:
         Download the package to an existing directory containing attachments
         that don't belong to the museum object anymore
         """
-        (package_dir / "sip" / "attachments" / "100200").mkdir(parents=True)
-        (package_dir / "sip" / "attachments" / "100200" / "fake.jpg").touch()
-        (package_dir / "sip" / "attachments" / "100300").mkdir(parents=True)
-        (package_dir / "sip" / "attachments" / "100300" / "fake.jpg").touch()
+        for attachment_id in ("100200", "100300"):
+            make_marker(
+                package_dir / "sip" / "attachments" / attachment_id
+                / "fake.jpg"
+            )
 
         museum_object = load_museum_object(object_id="1234567")
         await museum_object.download_package(package_dir)
 
         # The old directories were removed when downloading the attachments
-        assert not (package_dir / "sip" / "attachments" / "100200").is_dir()
-        assert not (package_dir / "sip" / "attachments" / "100300").is_dir()
-        assert (package_dir / "sip" / "attachments" / "1234567001").is_dir()
-        assert (package_dir / "sip" / "attachments" / "1234567002").is_dir()
+        attachment_tree = scan_tree(package_dir / "sip" / "attachments")
+        assert "100200/" not in attachment_tree
+        assert "100300/" not in attachment_tree
+        assert "1234567001/" in attachment_tree
+        assert "1234567002/" in attachment_tree
 
     @pytest.mark.asyncio
     async def test_download_package_leftover_collection_activities(
@@ -65,15 +96,15 @@ class TestMuseumPackageDownload:
         """
         collection_activity_dir = package_dir / "sip" / "collection_activities"
         (collection_activity_dir / "765432001").mkdir(parents=True)
-        (collection_activity_dir / "10101010").mkdir(parents=True)
-        (collection_activity_dir / "10101010" / "test.xml").touch()
+        make_marker(collection_activity_dir / "10101010" / "test.xml")
 
         museum_object = load_museum_object(object_id="1234579")
         await museum_object.download_package(package_dir)
 
         # The old directory (10101010) was removed
-        assert not (collection_activity_dir / "10101010").is_dir()
-        assert (collection_activity_dir / "765432001").is_dir()
+        collection_activity_tree = scan_tree(collection_activity_dir)
+        assert "10101010/" not in collection_activity_tree
+        assert "765432001/" in collection_activity_tree
 
     @pytest.mark.asyncio
     async def test_downloads_cached(
@@ -84,80 +115,78 @@ class TestMuseumPackageDownload:
             "/module/Object/1234567/export/45005"
         ]
 
+        expected_counters = dict.fromkeys(REQUEST_URLS, 1)
+
         await museum_object.download_package(package_dir)
 
         # Every request should have been made once
-        for url in REQUEST_URLS:
-            assert mock_museumplus.request_counters[url] == 1
+        assert {
+            url: mock_museumplus.request_counters.get(url, 0)
+            for url in REQUEST_URLS
+        } == expected_counters
 
         await museum_object.download_package(package_dir)
 
         # Files already exist in the file system and no requests are made
-        for url in REQUEST_URLS:
-            assert mock_museumplus.request_counters[url] == 1
+        assert {
+            url: mock_museumplus.request_counters.get(url, 0)
+            for url in REQUEST_URLS
+        } == expected_counters
 
 
+@pytest.mark.usefixtures("prefetch_dpres_commands")
 class TestMuseumObjectPackageSIP:
-    @pytest.mark.asyncio
     @pytest.mark.slow
-    async def test_generate_sip(self, museum_package, extract_tar):
+    @pytest.mark.asyncio
+    async def test_generate_sip(
+            self, museum_package, extract_tar, parse_mets):
         """
         Test generating a SIP from a downloaded museum package
         """
         await museum_package.generate_sip()
+        package_tree = scan_tree(museum_package.path)
 
         # Test that the SIP was created
-        assert museum_package.sip_archive_path.is_file()
+        assert museum_package.sip_filename in package_tree
 
         # Test that logs exist
         for name in ("compile-mets", "compile-structmap", "compress",
                      "create-mix", "import-object", "premis-event",
                      "sign-mets"):
-            assert (museum_package.log_dir / f"{name}.log").is_file()
+            assert f"logs/{name}.log" in package_tree
 
         # Workspace should be empty
-        assert museum_package.workspace_dir.is_dir()
-        assert not list(museum_package.workspace_dir.glob("*"))
+        assert "workspace/" in package_tree
+        assert not any(
+            path.startswith("workspace/") and path != "workspace/"
+            for path in package_tree
+        )
 
         # No collection activities linked to this Object
-        assert not museum_package.collection_activity_dir.is_dir()
+        assert "sip/collection_activities/" not in package_tree
 
         # Extract TAR and ensure files inside it exist
         tar_path = extract_tar(museum_package.sip_archive_path)
+        tar_tree = scan_tree(tar_path)
 
-        assert (tar_path / "signature.sig").is_file()
-        assert (tar_path / "mets.xml").is_file()
-        assert (tar_path / "reports" / "lido.xml").is_file()
-        assert (
-            tar_path / "attachments" / "1234567001" / "kuva1.JPG"
-        ).is_file()
-        assert (
-            tar_path / "attachments" / "1234567002" / "kuva2.JPG"
-        ).is_file()
+        assert "signature.sig" in tar_tree
+        assert "mets.xml" in tar_tree
+        assert "reports/lido.xml" in tar_tree
+        assert "attachments/1234567001/kuva1.JPG" in tar_tree
+        assert "attachments/1234567002/kuva2.JPG" in tar_tree
 
-        xml = lxml.etree.parse(str(tar_path / "mets.xml"))
+        xml = parse_mets(tar_path)
 
         # Check that mets.xml contains expected entries
         # lido.xml was embedded
-        assert len(
-            xml.findall(
-                f"{{{METS_NS}}}dmdSec//"
-                f"{{{METS_NS}}}mdWrap[@MDTYPE='LIDO']"
-            )
-        ) == 1
+        assert LIDO_MD_WRAP_COUNT(xml) == 1
 
         # Contains 'creation' event
-        event = xml.find(
-            f"{{{METS_NS}}}amdSec//"
-            f"{{{METS_NS}}}digiprovMD//"
-            f"{{{METS_NS}}}mdWrap[@MDTYPE='PREMIS:EVENT']//"
-            f"{{{PREMIS_NS}}}event/"
-            f"{{{PREMIS_NS}}}eventDetail[.='Object database entry creation']/.."
-        )
-        assert event.find(f"{{{PREMIS_NS}}}eventType").text == "creation"
-        assert event.find(f"{{{PREMIS_NS}}}eventDateTime").text == \
+        event = CREATION_EVENT(xml)[0]
+        assert event.find(EVENT_TYPE_TAG).text == "creation"
+        assert event.find(EVENT_DATE_TIME_TAG).text == \
             "1970-01-01T00:00:00+00:00"
-        assert event.find(f"{{{PREMIS_NS}}}eventDetail").text == \
+        assert event.find(EVENT_DETAIL_TAG).text == \
             "Object database entry creation"
 
         # Files were imported with correct IDs
@@ -169,40 +198,36 @@ class TestMuseumObjectPackageSIP:
             "Object:1234567:reports/Object.xml",
             "Object:1234567:reports/lido.xml",
         ]
+        identifier_counts = Counter(OBJECT_IDENTIFIER_VALUES(xml))
         for file_id in file_ids:
-            assert len(xml.findall(
-                f"{{{METS_NS}}}amdSec//{{{METS_NS}}}techMD//"
-                f"{{{PREMIS_NS}}}objectIdentifierValue[.='{file_id}']"
-            )) == 1
+            assert identifier_counts[file_id] == 1
 
-    @pytest.mark.asyncio
     @pytest.mark.slow
+    @pytest.mark.asyncio
     async def test_generate_sip_with_archive(
-            self, museum_package_factory, extract_tar):
+            self, museum_package_factory, extract_tar, parse_mets):
         """
         Test generating a SIP from a downloaded museum package that
         has a ZIP file
         """
         museum_package = await museum_package_factory("1234569")
         await museum_package.generate_sip()
+        package_tree = scan_tree(museum_package.path)
 
         # SIP was generated
-        assert museum_package.sip_archive_path.is_file()
+        assert museum_package.sip_filename in package_tree
 
         # 'extract-archive.log' exists
-        assert (museum_package.log_dir / "extract-archive.log").is_file()
+        assert "logs/extract-archive.log" in package_tree
 
         tar_path = extract_tar(museum_package.sip_archive_path)
+        tar_tree = scan_tree(tar_path)
 
         # Ensure the TAR was extracted corrctly
-        assert (
-            tar_path / "attachments" / "1234569001" / "test.zip" / "kuva1.JPG"
-        ).is_file()
-        assert (
-            tar_path / "attachments" / "1234569001" / "test.zip" / "kuva2.JPG"
-        ).is_file()
+        assert "attachments/1234569001/test.zip/kuva1.JPG" in tar_tree
+        assert "attachments/1234569001/test.zip/kuva2.JPG" in tar_tree
 
-        xml = lxml.etree.parse(str(tar_path / "mets.xml"))
+        xml = parse_mets(tar_path)
 
         # Files were imported with correct IDs
         file_ids = [
@@ -212,16 +237,15 @@ class TestMuseumObjectPackageSIP:
             "Object:1234569:reports/Object.xml",
             "Object:1234569:reports/lido.xml",
         ]
+        identifier_counts = Counter(OBJECT_IDENTIFIER_VALUES(xml))
         for file_id in file_ids:
-            assert len(xml.findall(
-                f"{{{METS_NS}}}amdSec//{{{METS_NS}}}techMD//"
-                f"{{{PREMIS_NS}}}objectIdentifierValue[.='{file_id}']"
-            )) == 1
+            assert identifier_counts[file_id] == 1
 
-    @pytest.mark.asyncio
     @pytest.mark.slow
+    @pytest.mark.asyncio
     async def test_generate_sip_with_collection_activities(
-            self, package_dir, museum_package_factory, extract_tar):
+            self, package_dir, museum_package_factory, extract_tar,
+            parse_mets):
         """
         Generate a SIP from an Object with two related CollectioActivity
         entries
@@ -233,18 +257,19 @@ class TestMuseumObjectPackageSIP:
         assert museum_package.sip_archive_path.is_file()
 
         tar_path = extract_tar(museum_package.sip_archive_path)
+        tar_tree = scan_tree(tar_path)
 
         # Ensure the TAR was extracted corrctly
         assert (
-            tar_path / "collection_activities" / "765432001"
-            / "CollectionActivity.xml"
-        ).is_file()
+            "collection_activities/765432001/CollectionActivity.xml"
+            in tar_tree
+        )
         assert (
-            tar_path / "collection_activities" / "765432002"
-            / "CollectionActivity.xml"
-        ).is_file()
+            "collection_activities/765432002/CollectionActivity.xml"
+            in tar_tree
+        )
 
-        xml = lxml.etree.parse(str(tar_path / "mets.xml"))
+        xml = parse_mets(tar_path)
 
         # Files were imported with correct IDs
         file_ids = [
@@ -253,14 +278,12 @@ class TestMuseumObjectPackageSIP:
             "CollectionActivity:765432001:CollectionActivity.xml",
             "CollectionActivity:765432002:CollectionActivity.xml",
         ]
+        identifier_counts = Counter(OBJECT_IDENTIFIER_VALUES(xml))
         for file_id in file_ids:
-            assert len(xml.findall(
-                f"{{{METS_NS}}}amdSec//{{{METS_NS}}}techMD//"
-                f"{{{PREMIS_NS}}}objectIdentifierValue[.='{file_id}']"
-            )) == 1
+            assert identifier_counts[file_id] == 1
 
-    @pytest.mark.asyncio
     @pytest.mark.slow
+    @pytest.mark.asyncio
     async def test_generate_sip_with_sip_id(
             self, package_dir, museum_package_factory):
         """
@@ -279,30 +302,24 @@ class TestMuseumObjectPackage:
     def test_all_files(self, museum_package):
         assert len(museum_package.all_files) == 6
 
-        all_files = museum_package.all_files
+        name_counts = Counter(x.name for x in museum_package.all_files)
 
-        for name in ("Object.xml", "lido.xml", "kuva1.JPG", "kuva2.JPG"):
-            assert any([x.name.endswith(name) for x in all_files])
+        for name in ("Object.xml", "lido.xml", *KUVA_FILENAMES):
+            assert name in name_counts
 
-        assert len([
-            x for x in all_files
-            if x.name.endswith("Multimedia.xml")
-        ]) == 2
+        assert name_counts["Multimedia.xml"] == 2
 
     def test_image_files(self, museum_package):
         assert len(museum_package.image_files) == 2
-        for filename in ("kuva1.JPG", "kuva2.JPG"):
-            assert any(
-                file_ for file_ in museum_package.image_files
-                if file_.name.endswith(filename)
-            )
+        names = {file_.name for file_ in museum_package.image_files}
+
+        assert KUVA_FILENAMES <= names
 
     def test_attachments(self, museum_package):
-        for filename in ("kuva1.JPG", "kuva2.JPG"):
-            assert any(
-                attachment for attachment in museum_package.attachments
-                if attachment.filename == filename
-            )
+        filenames = {
+            attachment.filename for attachment in museum_package.attachments
+        }
+        assert KUVA_FILENAMES <= filenames
 
     def test_sip_filename(self, museum_package):
         assert museum_package.sip_filename == "20190102_Object_1234567.tar"
@@ -320,9 +337,9 @@ class TestMuseumObjectPackage:
             path=museum_package.path
         )
         assert len(museum_package.attachments) == 2
-        assert set([
+        assert {
             attach.filename for attach in museum_package.attachments
-        ]) == set(["kuva1.JPG", "kuva2.JPG"])
+        } == KUVA_FILENAMES
 
         # If the Multimedia.xml file doesn't exist, the attachment won't be
         # loaded
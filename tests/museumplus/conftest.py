@@ -1,9 +1,11 @@
-import time
-from collections import defaultdict
+import copy
+import functools
+import os
+from collections import namedtuple
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from pathlib import Path
 from socketserver import ThreadingMixIn
-from threading import Event, Thread
+from threading import Thread
 
 import aiohttp
 import lxml.etree
@@ -20,39 +22,55 @@ def museum_attachment(load_museum_attachment):
     return load_museum_attachment(attachment_id="1234567001")
 
 
+# Directory containing the mocked MuseumPlus API responses
+MOCK_ROOT = Path(__file__).resolve().parent / "data" / "museumplus_mock"
+
+# Request received by the mock MuseumPlus server
+RequestLog = namedtuple("RequestLog", ("method", "url", "content"))
+
+
 # Defined here for Python 3.6 compatibility
 class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
     daemon_threads = True
 
 
 class MockMuseumPlusHandler(BaseHTTPRequestHandler):
+    def read_body(self):
+        """
+        Read the request body
+        """
+        length = int(self.headers["Content-Length"])
+        return self.rfile.read(length)
+
     def make_response(self, path):
         content_type = self.headers["Content-Type"]
-        content = None
 
-        if content_type == "application/xml":
-            path = path.with_suffix(".xml")
+        if content_type == "application/xml" and not path.endswith(".xml"):
+            path += ".xml"
 
         with open(path, "rb") as f:
-            content = f.read()
+            size = os.fstat(f.fileno()).st_size
+
+            if not size:
+                self.send_response(404)
+                self.end_headers()
+                return
 
-        if content:
             self.send_response(200)
             self.send_header("Content-Type", content_type)
-            self.send_header("Content-Length", len(content))
-            self.end_headers()
-            self.wfile.write(content)
-        else:
-            self.send_response(404)
+            self.send_header("Content-Length", size)
             self.end_headers()
 
+            # Let the kernel copy the file to the socket directly;
+            # 'socket.sendfile' falls back to regular sends if needed
+            self.connection.sendfile(f)
+
     def do_GET(self):
         """
         For GET requests, retrieve a file from the mocked test data directory
         and return it as-is
         """
-        path = Path(self.server.museumplus.base_path) / Path(self.path[1:])
-        self.make_response(path)
+        self.make_response(self.server.museumplus.base_path_str + self.path)
 
         # Keep track of how many times each request has been made
         self.server.museumplus.log_request(
@@ -64,16 +82,16 @@ class MockMuseumPlusHandler(BaseHTTPRequestHandler):
         For POST requests, retrieve and return files in ascending order from
         a specific directory to mimic changes between requests
         """
-        sequence_id = self.server.museumplus.request_counters[self.path]
-
-        path = Path(
-            self.server.museumplus.base_path
-        ) / Path(self.path[1:]) / str(sequence_id)
+        sequence_id = self.server.museumplus.request_counters.get(
+            self.path, 0
+        )
 
-        self.make_response(path)
+        self.make_response(
+            f"{self.server.museumplus.base_path_str}{self.path}/{sequence_id}"
+        )
 
         # Keep track of how many times each request has been made
-        request_content = self.rfile.read(int(self.headers["Content-Length"]))
+        request_content = self.read_body()
         self.server.museumplus.log_request(
             method="POST", url=self.path, content=request_content
         )
@@ -83,7 +101,7 @@ class MockMuseumPlusHandler(BaseHTTPRequestHandler):
         For PUT requests, simply return a 204 No Content response
         """
         # Keep track of how many times each request has been made
-        request_content = self.rfile.read(int(self.headers["Content-Length"]))
+        request_content = self.read_body()
         self.server.museumplus.log_request(
             method="PUT", url=self.path, content=request_content
         )
@@ -92,11 +110,11 @@ class MockMuseumPlusHandler(BaseHTTPRequestHandler):
         # otherwise 404
         object_id = self.path.split("/")[-2]
         object_id_xml_path = (
-            Path(self.server.museumplus.base_path)
-            / "module" / "Object" / f"{object_id}.xml"
+            f"{self.server.museumplus.base_path_str}/module/Object/"
+            f"{object_id}.xml"
         )
 
-        if object_id_xml_path.exists():
+        if os.path.exists(object_id_xml_path):
             self.send_response(204)
         else:
             self.send_response(404)
@@ -118,47 +136,101 @@ class MockMuseumPlus:
     """
     def __init__(self, base_path, port):
         self.base_path = base_path
+        self.base_path_str = str(base_path)
         self.port = port
 
-        self.request_counters = defaultdict(int)
+        self.request_counters = {}
         self.requests = []
 
         self.server = ThreadingHTTPServer(
             ("127.0.0.1", port), MockMuseumPlusHandler
         )
-        self.server.timeout = 0.05
         self.server.museumplus = self
 
+    def reset(self, base_path):
+        """
+        Serve files from a new path and forget the requests received so far
+        """
+        self.base_path = Path(base_path)
+        # Request paths are appended to this as-is when mapping them
+        # to files
+        self.base_path_str = str(base_path)
+        self.request_counters.clear()
+        self.requests.clear()
+
     def log_request(self, method, url, content):
         """
         Log a received request to allow it to be examined by tests afterwards
         """
-        self.request_counters[url] += 1
-        self.requests.append({
-            "method": method,
-            "url": url,
-            "content": content
-        })
+        self.request_counters[url] = self.request_counters.get(url, 0) + 1
+        self.requests.append(RequestLog(method, url, content))
 
-    def serve_requests(self):
-        self.server.handle_request()
 
+def start_mock_server(mock_server):
+    """
+    Start serving requests for the given mock server in a background thread
+    """
+    # Requests are handled as soon as they arrive; the poll interval
+    # only determines how quickly 'shutdown' returns
+    Thread(
+        target=mock_server.server.serve_forever,
+        kwargs={"poll_interval": 0.01},
+        daemon=True
+    ).start()
 
-def launch_mock_thread(mock_server, shutdown_flag):
-    while not shutdown_flag.is_set():
-        mock_server.serve_requests()
-        time.sleep(0.02)
 
+def stop_mock_server(mock_server):
+    """
+    Stop a mock server started using 'start_mock_server'
+    """
+    mock_server.server.shutdown()
     mock_server.server.server_close()
 
 
+@pytest.fixture(scope="session")
+def mock_museumplus_server(unused_tcp_port_factory):
+    """
+    Mock MuseumPlus server shared by all tests in the session.
+
+    Use 'launch_mock_museumplus' to point it to a directory for the
+    duration of a single test.
+    """
+    mock_server = MockMuseumPlus(
+        base_path=None, port=unused_tcp_port_factory()
+    )
+    start_mock_server(mock_server)
+
+    yield mock_server
+
+    stop_mock_server(mock_server)
+
+
 @pytest.fixture(scope="function")
-def launch_mock_museumplus(unused_tcp_port_factory, monkeypatch, tmp_path):
-    shutdown_flag = Event()
-    threads = []
+def launch_mock_museumplus(
+        mock_museumplus_server, unused_tcp_port_factory, monkeypatch):
+    """
+    Launch a mock MuseumPlus server serving files from the given directory
+    and point the MuseumPlus URL to it.
+
+    The first call in a test reuses the session-wide server. Any further
+    calls start a separate server, so that the state recorded by the
+    servers launched earlier in the same test is kept intact.
+    """
+    launched_servers = []
 
     def func(path):
-        port = unused_tcp_port_factory()
+        if not launched_servers:
+            mock_server = mock_museumplus_server
+            mock_server.reset(base_path=path)
+        else:
+            mock_server = MockMuseumPlus(
+                base_path=Path(path), port=unused_tcp_port_factory()
+            )
+            start_mock_server(mock_server)
+
+        launched_servers.append(mock_server)
+
+        url = f"http://127.0.0.1:{mock_server.port}"
         attrs = (
             "passari.museumplus.db.MUSEUMPLUS_URL",
             "passari.museumplus.connection.MUSEUMPLUS_URL",
@@ -169,35 +241,20 @@ def launch_mock_museumplus(unused_tcp_port_factory, monkeypatch, tmp_path):
 
         # Monkeypatch modules using the MuseumPlus URL
         for attr in attrs:
-            monkeypatch.setattr(attr, f"http://127.0.0.1:{port}")
-
-        mock_server = MockMuseumPlus(
-            base_path=path, port=port
-        )
-
-        thread = Thread(
-            target=launch_mock_thread,
-            kwargs={
-                "mock_server": mock_server, "shutdown_flag": shutdown_flag
-            }
-        )
-        thread.start()
-        threads.append(thread)
+            monkeypatch.setattr(attr, url)
 
         return mock_server
 
     yield func
-    shutdown_flag.set()
 
-    for thread in threads:
-        thread.join()
+    # The session-wide server is stopped at the end of the session
+    for mock_server in launched_servers[1:]:
+        stop_mock_server(mock_server)
 
 
 @pytest.fixture(scope="function")
 def mock_museumplus(launch_mock_museumplus):
-    return launch_mock_museumplus(
-        Path(__file__).resolve().parent / "data" / "museumplus_mock"
-    )
+    return launch_mock_museumplus(MOCK_ROOT)
 
 
 @pytest.fixture(scope="function")
@@ -207,21 +264,31 @@ async def museum_session():
     await session.close()
 
 
+@functools.lru_cache(maxsize=None)
+def _parse_mock_xml(path):
+    with open(path, "rb") as f:
+        return lxml.etree.parse(f)
+
+
+def parse_mock_xml(path):
+    """
+    Parse a XML document from the mock MuseumPlus data.
+
+    Each document is only parsed once per session. Every caller receives
+    its own copy of the cached tree, so it can be modified freely.
+    """
+    return copy.deepcopy(_parse_mock_xml(path))
+
+
 @pytest.fixture(scope="function")
 def load_museum_object(museum_session):
     from passari.museumplus.db import MuseumObject
 
     def func(object_id):
-        path = (
-            Path(__file__).resolve().parent
-            / "data" / "museumplus_mock" / "module" / "Object"
-            / f"{object_id}.xml"
-        )
-        with open(path, "rb") as f:
-            etree = lxml.etree.parse(f)
+        path = MOCK_ROOT / "module" / "Object" / f"{object_id}.xml"
 
         return MuseumObject(
-            etree=etree,
+            etree=parse_mock_xml(path),
             session=museum_session
         )
 
@@ -233,14 +300,8 @@ def load_museum_attachment(museum_session):
     from passari.museumplus.db import MuseumAttachment
 
     def func(attachment_id):
-        path = (
-            Path(__file__).resolve().parent
-            / "data" / "museumplus_mock" / "module" / "Multimedia"
-            / f"{attachment_id}.xml"
-        )
-        with open(path, "rb") as f:
-            etree = lxml.etree.parse(f)
+        path = MOCK_ROOT / "module" / "Multimedia" / f"{attachment_id}.xml"
 
-        return MuseumAttachment(etree)
+        return MuseumAttachment(parse_mock_xml(path))
 
     return func
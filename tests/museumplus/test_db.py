@@ -1,7 +1,9 @@
 import datetime
+
 import pytest
 
-from passari.museumplus.db import get_museum_object
+from passari.museumplus.db import MuseumObject, get_museum_object
+from tests.museumplus.conftest import MOCK_ROOT
 
 
 class TestMuseumObject:
@@ -39,6 +41,15 @@ class TestMuseumObject:
             765432001, 765432002
         ]
 
+    def test_from_path(self, museum_object):
+        museum_object_from_path = MuseumObject.from_path(
+            MOCK_ROOT / "module" / "Object" / "1234567.xml"
+        )
+
+        assert museum_object_from_path.object_id == "1234567"
+        assert museum_object_from_path.session is None
+        assert museum_object_from_path.tostring() == museum_object.tostring()
+
 
 class TestMuseumAttachment:
     """
@@ -40,10 +40,10 @@ async def test_set_object_field(museum_session, mock_museumplus):
     # Check that the expected response was constructed
     request = mock_museumplus.requests[0]
 
-    assert request["method"] == "PUT"
-    assert request["url"] == "/module/Object/1234567/ObjTestTxt"
+    assert request.method == "PUT"
+    assert request.url == "/module/Object/1234567/ObjTestTxt"
 
-    xml = lxml.etree.fromstring(request["content"])
+    xml = lxml.etree.fromstring(request.content)
     module_item = xml.find(
         f"{{{ZETCOM_NS}}}modules//"
         f"{{{ZETCOM_NS}}}moduleItem[@id='1234567']"
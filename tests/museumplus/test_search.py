@@ -5,8 +5,10 @@ import lxml.etree
 import pytest
 from passari.config import CONFIG
 from passari.museumplus.search import (ObjectSearchResponse,
-                                       iterate_multimedia, iterate_objects)
+                                       iterate_multimedia, iterate_objects,
+                                       parse_timestamp)
 from passari.museumplus.settings import ZETCOM_SEARCH_NS
+from passari.utils import get_xml_parser
 
 
 @pytest.mark.asyncio
@@ -42,8 +44,10 @@ async def test_iterate_objects(museum_session, mock_museumplus):
     assert not results[2]["created_date"]
     assert not results[2]["modified_date"]
 
-    search_request = mock_museumplus.requests[0]["content"]
-    search_xml = lxml.etree.fromstring(search_request)
+    search_request = mock_museumplus.requests[0].content
+    search_xml = lxml.etree.fromstring(
+        search_request, parser=get_xml_parser()
+    )
 
     # Search request did *not* filter the results by default
     assert search_xml.find(f".//{{{ZETCOM_SEARCH_NS}}}sort")
@@ -73,8 +77,10 @@ async def test_iterate_objects_filter_modification_date(
 
     # Instead, inspect the generated search request body to check that it's
     # what we're expecting
-    search_request = mock_museumplus.requests[0]["content"]
-    search_xml = lxml.etree.fromstring(search_request)
+    search_request = mock_museumplus.requests[0].content
+    search_xml = lxml.etree.fromstring(
+        search_request, parser=get_xml_parser()
+    )
 
     # Search request did *not* filter the results by default
     assert search_xml.find(f".//{{{ZETCOM_SEARCH_NS}}}sort")
@@ -192,7 +198,7 @@ def test_museum_search_response_hash(monkeypatch):
         "dataField"
     )
 
-    xml = lxml.etree.fromstring(SEARCH_RESULTS)
+    xml = lxml.etree.fromstring(SEARCH_RESULTS, parser=get_xml_parser())
     search_response = ObjectSearchResponse(xml)
     results = search_response.results
 
@@ -202,3 +208,47 @@ def test_museum_search_response_hash(monkeypatch):
         "39c6cf572b1a39d56843dd5e2dc27912021faf67959c9e12169ab703e39074c8"
     assert results[1]["xml_hash"] == \
         "39c6cf572b1a39d56843dd5e2dc27912021faf67959c9e12169ab703e39074c8"
+
+
+def test_museum_search_response_bytes():
+    """
+    Test that parsing the search results incrementally from bytes returns
+    the same results as parsing the whole document
+    """
+    xml = lxml.etree.fromstring(SEARCH_RESULTS, parser=get_xml_parser())
+
+    results = ObjectSearchResponse.from_bytes(SEARCH_RESULTS).results
+
+    assert len(results) == 2
+    assert results == ObjectSearchResponse(xml).results
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        (
+            "2018-11-21 10:44:19.6",
+            datetime.datetime(
+                2018, 11, 21, 10, 44, 19, 600000,
+                tzinfo=datetime.timezone.utc
+            )
+        ),
+        (
+            "2018-11-21 10:44:19",
+            datetime.datetime(
+                2018, 11, 21, 10, 44, 19, tzinfo=datetime.timezone.utc
+            )
+        ),
+        # Formats other than the one used by MuseumPlus are parsed using
+        # dateutil
+        (
+            "21 Nov 2018 10:44",
+            datetime.datetime(
+                2018, 11, 21, 10, 44, tzinfo=datetime.timezone.utc
+            )
+        ),
+        (None, None)
+    ]
+)
+def test_parse_timestamp(value, expected):
+    assert parse_timestamp(value) == expected
@@ -8,6 +8,13 @@ import pytest
 from passari.config import CONFIG
 from passari.museumplus.settings import ZETCOM_NS
 from passari.scripts.confirm_sip import cli as confirm_sip_cli
+from passari.utils import get_xml_parser
+
+PRESERVATION_VALUE_XPATH = lxml.etree.XPath(
+    "zetcom:modules//zetcom:moduleItem[@id=$object_id]"
+    "/zetcom:dataField[@name='fakePreservationTxt']/zetcom:value",
+    namespaces={"zetcom": ZETCOM_NS}
+)
 
 
 @pytest.fixture(scope="function")
@@ -87,21 +94,15 @@ class TestConfirmSIP:
         # MuseumPlus was updated with a preservation event
         last_request = mock_museumplus.requests[-1]
 
-        assert last_request["method"] == "PUT"
-        assert last_request["url"] == \
+        assert last_request.method == "PUT"
+        assert last_request.url == \
             "/module/Object/1234567/fakePreservationTxt"
 
-        xml = lxml.etree.fromstring(last_request["content"])
-        module_item = xml.find(
-            f"{{{ZETCOM_NS}}}modules//"
-            f"{{{ZETCOM_NS}}}moduleItem[@id='1234567']"
+        xml = lxml.etree.fromstring(
+            last_request.content, parser=get_xml_parser()
         )
-
         events = json.loads(
-            module_item.find(
-                f"{{{ZETCOM_NS}}}dataField[@name='fakePreservationTxt']"
-                f"{{{ZETCOM_NS}}}value"
-            ).text
+            PRESERVATION_VALUE_XPATH(xml, object_id="1234567")[0].text
         )
 
         assert len(events) == 1
@@ -141,21 +142,15 @@ class TestConfirmSIP:
         # MuseumPlus was updated with a preservation event
         last_request = mock_museumplus.requests[-1]
 
-        assert last_request["method"] == "PUT"
-        assert last_request["url"] == \
+        assert last_request.method == "PUT"
+        assert last_request.url == \
             "/module/Object/1234567/fakePreservationTxt"
 
-        xml = lxml.etree.fromstring(last_request["content"])
-        module_item = xml.find(
-            f"{{{ZETCOM_NS}}}modules//"
-            f"{{{ZETCOM_NS}}}moduleItem[@id='1234567']"
+        xml = lxml.etree.fromstring(
+            last_request.content, parser=get_xml_parser()
         )
-
         events = json.loads(
-            module_item.find(
-                f"{{{ZETCOM_NS}}}dataField[@name='fakePreservationTxt']"
-                f"{{{ZETCOM_NS}}}value"
-            ).text
+            PRESERVATION_VALUE_XPATH(xml, object_id="1234567")[0].text
         )
 
         assert len(events) == 1
@@ -183,5 +178,5 @@ class TestConfirmSIP:
 
         # MuseumPlus was not updated
         assert not any(
-            request["method"] == "PUT" for request in mock_museumplus.requests
+            request.method == "PUT" for request in mock_museumplus.requests
         )
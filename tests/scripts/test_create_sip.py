@@ -1,6 +1,5 @@
 from pathlib import Path
 
-import lxml.etree
 import pytest
 from passari.scripts.create_sip import cli as create_sip_cli
 
@@ -32,7 +31,8 @@ def create_sip(cli):
 
 class TestCreateSIP:
     @pytest.mark.slow
-    def test_success(self, create_sip, museum_package_dir, extract_tar):
+    def test_success(
+            self, create_sip, museum_package_dir, extract_tar, parse_mets):
         """
         Test creating a submission SIP
         """
@@ -49,7 +49,7 @@ class TestCreateSIP:
         assert (package_dir / "workspace").is_dir()
 
         tar_path = extract_tar(package_dir / "20190102_Object_1234567.tar")
-        xml = lxml.etree.parse(str(tar_path / "mets.xml"))
+        xml = parse_mets(tar_path)
 
         # METS header contains expected date entries
         mets_hdr = xml.find(f"{{{METS_NS}}}metsHdr")
@@ -69,7 +69,8 @@ class TestCreateSIP:
         assert version[0].isdigit()
 
     @pytest.mark.slow
-    def test_update(self, create_sip, museum_package_dir, extract_tar):
+    def test_update(
+            self, create_sip, museum_package_dir, extract_tar, parse_mets):
         """
         Test creating an update SIP
         """
@@ -84,7 +85,7 @@ class TestCreateSIP:
         assert package_dir.is_dir()
 
         tar_path = extract_tar(package_dir / "20190102_Object_1234567.tar")
-        xml = lxml.etree.parse(str(tar_path / "mets.xml"))
+        xml = parse_mets(tar_path)
 
         # METS header contains expected date entries for an update SIP
         mets_hdr = xml.find(f"{{{METS_NS}}}metsHdr")
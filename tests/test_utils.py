@@ -4,17 +4,18 @@ import lxml.etree
 
 import pytest
 from passari.museumplus.settings import ZETCOM_NS
-from passari.utils import get_xml_hash, gather_or_raise_first
+from passari.utils import (gather_or_raise_first, get_xml_hash,
+                           get_xml_parser)
 
-DOCUMENT_A = b"""<?xml version="1.0" encoding="UTF-8"?>
+DOCUMENT_TEMPLATE = b"""<?xml version="1.0" encoding="UTF-8"?>
 <application xmlns="http://www.zetcom.com/ria/ws/module">
     <modules>
-        <moduleItem hasAttachments="false" id="100001" uuid="1713AFC83A9C49D2A4048E17B58B1ECB">
+        <moduleItem hasAttachments="false" id="100001" uuid="%(uuid)s">
             <systemField dataType="Long" name="__id">
                 <value>100001</value>
             </systemField>
             <systemField dataType="Timestamp" name="__lastModified">
-                <value>2018-11-21 10:44:19.6</value>
+                <value>%(last_modified)s</value>
                 <formattedValue language="en">21.11.2018 10:44</formattedValue>
             </systemField>
             <systemField dataType="Timestamp" name="__created">
@@ -28,66 +29,50 @@ DOCUMENT_A = b"""<?xml version="1.0" encoding="UTF-8"?>
     </modules>
 </application>
 """
+
+DOCUMENT_A = DOCUMENT_TEMPLATE % {
+    b"uuid": b"1713AFC83A9C49D2A4048E17B58B1ECB",
+    b"last_modified": b"2018-11-21 10:44:19.6"
+}
 # Identical to A, but has more recent modification datetime
-DOCUMENT_B = b"""<?xml version="1.0" encoding="UTF-8"?>
-<application xmlns="http://www.zetcom.com/ria/ws/module">
-    <modules>
-        <moduleItem hasAttachments="false" id="100001" uuid="1713AFC83A9C49D2A4048E17B58B1ECB">
-            <systemField dataType="Long" name="__id">
-                <value>100001</value>
-            </systemField>
-            <systemField dataType="Timestamp" name="__lastModified">
-                <value>2019-11-21 10:44:19.6</value>
-                <formattedValue language="en">21.11.2018 10:44</formattedValue>
-            </systemField>
-            <systemField dataType="Timestamp" name="__created">
-                <value>2018-10-21 10:44:19.6</value>
-                <formattedValue language="en">21.10.2018 10:44</formattedValue>
-            </systemField>
-            <virtualField name="ObjObjectVrt">
-                <value>Object 100001</value>
-            </virtualField>
-        </moduleItem>
-    </modules>
-</application>
-"""
+DOCUMENT_B = DOCUMENT_TEMPLATE % {
+    b"uuid": b"1713AFC83A9C49D2A4048E17B58B1ECB",
+    b"last_modified": b"2019-11-21 10:44:19.6"
+}
 # Identical to A, but has a different UUID
-DOCUMENT_C = b"""<?xml version="1.0" encoding="UTF-8"?>
-<application xmlns="http://www.zetcom.com/ria/ws/module">
-    <modules>
-        <moduleItem hasAttachments="false" id="100001" uuid="2713AFC83A9C49D2A4048E17B58B1ECB">
-            <systemField dataType="Long" name="__id">
-                <value>100001</value>
-            </systemField>
-            <systemField dataType="Timestamp" name="__lastModified">
-                <value>2018-11-21 10:44:19.6</value>
-                <formattedValue language="en">21.11.2018 10:44</formattedValue>
-            </systemField>
-            <systemField dataType="Timestamp" name="__created">
-                <value>2018-10-21 10:44:19.6</value>
-                <formattedValue language="en">21.10.2018 10:44</formattedValue>
-            </systemField>
-            <virtualField name="ObjObjectVrt">
-                <value>Object 100001</value>
-            </virtualField>
-        </moduleItem>
-    </modules>
-</application>
-"""
+DOCUMENT_C = DOCUMENT_TEMPLATE % {
+    b"uuid": b"2713AFC83A9C49D2A4048E17B58B1ECB",
+    b"last_modified": b"2018-11-21 10:44:19.6"
+}
 
+MODULE_ITEM_PATH = f".//{{{ZETCOM_NS}}}moduleItem"
+VOLATILE_FIELD_QUERIES = (
+    f"{{{ZETCOM_NS}}}systemField[@name='__lastModified']",
+    f"{{{ZETCOM_NS}}}systemField[@name='__lastModifiedUser']"
+)
+# Same queries compiled in advance
+COMPILED_VOLATILE_FIELD_QUERIES = tuple(
+    lxml.etree.XPath(
+        f".//zetcom:systemField[@name='{name}']",
+        namespaces={"zetcom": ZETCOM_NS}
+    )
+    for name in ("__lastModified", "__lastModifiedUser")
+)
 
-def test_get_xml_hash():
+
+@pytest.mark.parametrize(
+    "volatile_field_queries",
+    [VOLATILE_FIELD_QUERIES, COMPILED_VOLATILE_FIELD_QUERIES],
+    ids=["string", "compiled"]
+)
+def test_get_xml_hash(volatile_field_queries):
     hashes = []
     for doc in (DOCUMENT_A, DOCUMENT_B, DOCUMENT_C):
-        xml = lxml.etree.fromstring(doc)
-        module_item = xml.find(f".//{{{ZETCOM_NS}}}moduleItem")
+        xml = lxml.etree.fromstring(doc, parser=get_xml_parser())
+        module_item = xml.find(MODULE_ITEM_PATH)
         hashes.append(
             get_xml_hash(
-                module_item,
-                volatile_field_queries=[
-                    f"{{{ZETCOM_NS}}}systemField[@name='__lastModified']",
-                    f"{{{ZETCOM_NS}}}systemField[@name='__lastModifiedUser']"
-                ]
+                module_item, volatile_field_queries=volatile_field_queries
             )
         )
 
@@ -102,27 +87,53 @@ def test_get_xml_hash():
 
 @pytest.mark.asyncio
 async def test_gather_or_raise_first():
-    async def delayed_success(i):
-        await asyncio.sleep(i*0.02)
+    async def wait_success(i, event):
+        await event.wait()
         return i
 
-    async def delayed_failure(i):
-        await asyncio.sleep(i*0.02)
+    async def wait_failure(i, event):
+        await event.wait()
         raise ValueError(f"Failure {i}")
 
+    cancelled = []
+
+    async def wait_forever():
+        try:
+            await asyncio.get_event_loop().create_future()
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def release(events):
+        # Allow the tasks to finish one by one in the given order
+        for event in events:
+            await asyncio.sleep(0)
+            event.set()
+
     # Test scenario where all tasks succeed
+    events = [asyncio.Event() for _ in range(3)]
+    releaser = asyncio.ensure_future(release(events))
     result = await gather_or_raise_first(
-        delayed_success(1), delayed_success(2), delayed_success(3)
+        wait_success(1, events[0]), wait_success(2, events[1]),
+        wait_success(3, events[2])
     )
+    await releaser
     assert result == [1, 2, 3]
 
     # Test scenario where one of the tasks fails
+    events = [asyncio.Event() for _ in range(3)]
+    releaser = asyncio.ensure_future(release(events))
     with pytest.raises(ValueError) as exc:
         await gather_or_raise_first(
-            delayed_success(1), delayed_success(2), delayed_failure(3),
+            wait_success(1, events[0]), wait_success(2, events[1]),
+            wait_failure(3, events[2]),
             # This last task will never finish and will be cancelled
-            # instead after 'delayed_failure(3)' fails
-            delayed_failure(100)
+            # instead after 'wait_failure(3)' fails
+            wait_forever()
         )
+    await releaser
 
     assert str(exc.value) == "Failure 3"
+
+    # The unfinished task was cancelled before the exception was raised
+    assert cancelled == [True]
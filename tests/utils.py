@@ -1,19 +1,84 @@
-import lxml.etree
+import functools
+import os
+from xml.parsers import expat
 
 from PIL import Image
 
 
+def get_file_key(path):
+    """
+    Return a key identifying the current version of a file, used to cache
+    the results of the checks below
+    """
+    stat = os.stat(path)
+    return (str(path), stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=None)
+def _is_xml_file(key):
+    path = key[0]
+
+    with open(path, "rb") as file_:
+        # Skip parsing files that can't be XML documents
+        if b"<" not in file_.read(256):
+            return False
+
+        file_.seek(0)
+
+        # Only well-formedness is checked, so stream the file through expat
+        # without building a tree
+        parser = expat.ParserCreate(namespace_separator=" ")
+
+        try:
+            parser.ParseFile(file_)
+            return True
+        except expat.ExpatError:
+            return False
+
+
 def is_xml_file(path):
     """
     Check if the file is a valid XML document
 
     :returns: True if file can be parsed as XML, False otherwise
     """
-    try:
-        lxml.etree.parse(str(path))
-        return True
-    except lxml.etree.ParseError:
-        return False
+    return _is_xml_file(get_file_key(path))
+
+
+# Magic bytes of the common image formats and the Pillow plugins that
+# handle them, so that these files don't need to be probed by every plugin.
+# RIFF and BMP headers are left to Pillow, since they are too generic to
+# identify an image on their own.
+IMAGE_MAGIC_FORMATS = (
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"II*\x00", "TIFF"),
+    (b"MM\x00*", "TIFF"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+    (b"\x89PNG\r\n\x1a\n", "PNG")
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _is_image_file(key):
+    with open(key[0], "rb") as file_:
+        header = file_.read(16)
+        file_.seek(0)
+
+        # Try every plugin if the format can't be recognized from the header
+        formats = None
+        for prefix, format_ in IMAGE_MAGIC_FORMATS:
+            if header.startswith(prefix):
+                formats = [format_]
+                break
+
+        try:
+            # Check the file's integrity without decoding the image data
+            with Image.open(file_, formats=formats) as image:
+                image.verify()
+            return True
+        except (IOError, SyntaxError):
+            return False
 
 
 def is_image_file(path):
@@ -22,8 +87,39 @@ def is_image_file(path):
 
     :returns: True if file is an image file, False otherwise
     """
-    try:
-        Image.open(str(path))
-        return True
-    except IOError:
-        return False
+    return _is_image_file(get_file_key(path))
+
+
+def make_marker(path):
+    """
+    Create an empty file and its parent directories if they don't exist
+    already
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o644))
+
+
+def scan_tree(path):
+    """
+    List every file and directory under the given directory
+
+    The directory is traversed using a single 'os.scandir' call per
+    directory, without stat'ing the individual entries.
+
+    :returns: frozenset of paths relative to the given directory.
+              Directory paths end with a slash.
+    """
+    entries = set()
+
+    def scan(dir_path, prefix):
+        with os.scandir(dir_path) as dir_entries:
+            for entry in dir_entries:
+                if entry.is_dir(follow_symlinks=False):
+                    entries.add(f"{prefix}{entry.name}/")
+                    scan(entry.path, f"{prefix}{entry.name}/")
+                else:
+                    entries.add(f"{prefix}{entry.name}")
+
+    scan(path, "")
+
+    return frozenset(entries)